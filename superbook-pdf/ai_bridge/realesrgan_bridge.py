@@ -7,6 +7,8 @@ Designed to be called from Rust via subprocess.
 
 Usage:
     python realesrgan_bridge.py -i INPUT -o OUTPUT [options]
+    python realesrgan_bridge.py --raw-in HxWxC --raw-out [options] < pixels > pixels
+    python realesrgan_bridge.py --serve SOCKET [options]
 
 Options:
     -i, --input     Input image path or directory
@@ -16,7 +18,20 @@ Options:
     -g, --gpu       GPU device ID (default: 0)
     --model         Model name (default: realesrgan-x4plus)
     --fp32          Use FP32 precision instead of FP16
-    --json          Output result as JSON
+    --channels-last Use channels_last (NHWC) memory format for Tensor Core kernels
+    --compile       Compile the model with torch.compile (inductor or tensorrt)
+    --trt           Run tiles through a cached TensorRT engine (built on first use)
+    --int8          Build the TensorRT engine with INT8, calibrated on a directory of pages
+    --warmup        Run a dummy forward pass after loading so page 1 isn't timed with autotuning
+    --json          Output result as JSON (NDJSON, one line per image, for directories)
+    --out-format    Output format for directory mode (png or jpg, default: input's)
+    --jpeg-quality  JPEG output quality (default: 95)
+    --png-compression  PNG zlib level 0-9 (default: OpenCV's fast level-1/RLE encoder)
+    --batch         Images per forward pass in directory mode (default: 4)
+    --tile-batch    Tiles per forward pass when an image is tiled (default: 1)
+    --raw-in        Read one raw uint8 HxWxC (BGR) image from stdin instead of -i
+    --raw-out       Write the result as raw uint8 bytes to stdout instead of -o
+    --serve         Keep the model loaded and serve JSON jobs on a Unix-domain socket
 
 Exit codes:
     0: Success
@@ -29,11 +44,26 @@ Exit codes:
 """
 
 import argparse
+import contextlib
+import copy
+import functools
+import hashlib
+import inspect
+import io
 import json
 import os
+import socket
+import stat
 import sys
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Optional
+
+# Must be set before torch initializes CUDA; grow segments in place instead of
+# cudaMalloc/cudaFree churn between differently sized tiles and batches
+os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "max_split_size_mb:512,expandable_segments:True")
 
 try:
     import torch
@@ -46,6 +76,26 @@ except ImportError as e:
     print("Install with: pip install realesrgan basicsr torch opencv-python", file=sys.stderr)
     sys.exit(2)
 
+try:
+    import torch_tensorrt
+except ImportError:
+    torch_tensorrt = None
+
+try:
+    import tensorrt as trt
+except ImportError:
+    trt = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    from turbojpeg import TurboJPEG, TJCS_GRAY, TJPF_BGR, TJPF_GRAY
+except ImportError:
+    TurboJPEG = None
+
 
 # Exit codes matching Rust exit_codes
 EXIT_SUCCESS = 0
@@ -56,6 +106,24 @@ EXIT_OUTPUT_ERROR = 4
 EXIT_GPU_ERROR = 5
 EXIT_OOM = 6
 
+# Encoder defaults. PNG has no explicit level by default: without one,
+# OpenCV already uses level 1 with the RLE strategy, and passing any level
+# switches it to the slower default zlib strategy
+DEFAULT_JPEG_QUALITY = 95
+DEFAULT_PNG_COMPRESSION = None
+
+# Input files picked up from directories
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tiff"}
+
+# Threads decoding directory inputs ahead of the GPU
+DECODE_WORKERS = 4
+
+# Models that tolerate INT8 post-training quantization
+INT8_MODELS = {"realesrgan-x4plus-anime"}
+
+# Pages sampled (one tile each) for INT8 calibration
+MAX_CALIBRATION_IMAGES = 200
+
 
 MODEL_URLS = {
     "RealESRGAN_x4plus.pth": "https://github.com/xinntao/Real-ESRGAN/releases/download/v0.1.0/RealESRGAN_x4plus.pth",
@@ -63,12 +131,15 @@ MODEL_URLS = {
     "RealESRGAN_x4plus_anime_6B.pth": "https://github.com/xinntao/Real-ESRGAN/releases/download/v0.2.2.4/RealESRGAN_x4plus_anime_6B.pth",
 }
 
+# Seconds without data before a weight download is abandoned
+DOWNLOAD_TIMEOUT = 60
+
 
 def download_model(model_filename: str, target_path: Path) -> bool:
-    """Download model weights if not present."""
+    """Download model weights if not present, streaming them into place."""
+    import tempfile
     import urllib.request
-    import ssl
-    
+
     if target_path.exists():
         return True
     
@@ -79,136 +150,507 @@ def download_model(model_filename: str, target_path: Path) -> bool:
     
     print(f"Downloading model: {model_filename}...", file=sys.stderr)
     target_path.parent.mkdir(parents=True, exist_ok=True)
-    
+
+    fd, tmp_name = tempfile.mkstemp(dir=target_path.parent, prefix=f"{target_path.name}.", suffix=".part")
+    tmp_path = Path(tmp_name)
     try:
-        # Create SSL context that doesn't verify certificates (for GitHub redirects)
-        ctx = ssl.create_default_context()
-        ctx.check_hostname = False
-        ctx.verify_mode = ssl.CERT_NONE
-        
-        urllib.request.urlretrieve(url, target_path)
+        received = 0
+        with os.fdopen(fd, "wb") as f, urllib.request.urlopen(url, timeout=DOWNLOAD_TIMEOUT) as response:
+            expected = int(response.headers.get("Content-Length") or 0)
+            while True:
+                chunk = response.read(1 << 20)
+                if not chunk:
+                    break
+                f.write(chunk)
+                received += len(chunk)
+
+        if expected and received != expected:
+            raise IOError(f"incomplete download ({received} of {expected} bytes)")
+
+        # Only complete downloads are renamed into place
+        os.replace(tmp_path, target_path)
         print(f"Downloaded: {target_path}", file=sys.stderr)
         return True
     except Exception as e:
+        tmp_path.unlink(missing_ok=True)
         print(f"Download failed: {e}", file=sys.stderr)
         return False
 
 
-def get_model(model_name: str, scale: int):
-    """Load RealESRGAN model."""
+@functools.lru_cache(maxsize=4)
+def find_model_weights(model_filename: str) -> str:
+    """Locate (or download) model weights; cached so repeat builds skip the stat calls."""
     # Determine script directory for weights path
     script_dir = Path(__file__).parent
     weights_dir = script_dir / "weights"
+
+    # Try multiple locations for weights
+    model_path = weights_dir / model_filename
+    
+    # Also check common cache locations
+    alt_paths = [
+        Path.home() / ".cache" / "realesrgan" / model_filename,
+        Path("/usr/share/realesrgan") / model_filename,
+    ]
     
+    # Find existing or download
+    if model_path.exists():
+        return str(model_path)
+    for alt in alt_paths:
+        if alt.exists():
+            return str(alt)
+
+    # Download to script's weights directory
+    if not download_model(model_filename, model_path):
+        raise FileNotFoundError(f"Model weights not found and download failed: {model_filename}")
+
+    return str(model_path)
+
+
+def get_model(model_name: str, scale: int):
+    """Load RealESRGAN model."""
     if model_name == "realesrgan-x4plus":
-        model = RRDBNet(
-            num_in_ch=3,
-            num_out_ch=3,
-            num_feat=64,
-            num_block=23,
-            num_grow_ch=32,
-            scale=4
-        )
+        num_block = 23
         netscale = 4
         model_filename = "RealESRGAN_x4plus.pth"
     elif model_name == "realesrgan-x2plus":
-        model = RRDBNet(
-            num_in_ch=3,
-            num_out_ch=3,
-            num_feat=64,
-            num_block=23,
-            num_grow_ch=32,
-            scale=2
-        )
+        num_block = 23
         netscale = 2
         model_filename = "RealESRGAN_x2plus.pth"
     elif model_name == "realesrgan-x4plus-anime":
+        num_block = 6
+        netscale = 4
+        model_filename = "RealESRGAN_x4plus_anime_6B.pth"
+    else:
+        raise ValueError(f"Unknown model: {model_name}")
+
+    # Locate (or download) the weights while the network skeleton is built
+    # and the CUDA context comes up
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        weights = pool.submit(find_model_weights, model_filename)
         model = RRDBNet(
             num_in_ch=3,
             num_out_ch=3,
             num_feat=64,
-            num_block=6,
+            num_block=num_block,
             num_grow_ch=32,
-            scale=4
+            scale=netscale
         )
-        netscale = 4
-        model_filename = "RealESRGAN_x4plus_anime_6B.pth"
-    else:
-        raise ValueError(f"Unknown model: {model_name}")
-    
-    # Try multiple locations for weights
-    model_path = weights_dir / model_filename
-    
-    # Also check common cache locations
-    alt_paths = [
-        Path.home() / ".cache" / "realesrgan" / model_filename,
-        Path("/usr/share/realesrgan") / model_filename,
-    ]
-    
-    # Find existing or download
-    if not model_path.exists():
-        for alt in alt_paths:
-            if alt.exists():
-                model_path = alt
-                break
+        if torch.cuda.is_available():
+            torch.cuda.init()
+        model_path = weights.result()
+
+    return model, netscale, model_path
+
+
+def compile_model(upsampler: RealESRGANer, model_name: str, tile: int, backend: str = "inductor") -> None:
+    """Replace upsampler.model with a torch.compile'd version, caching artifacts per (model, tile, dtype)."""
+    dtype = "fp16" if upsampler.half else "fp32"
+    if "TORCHINDUCTOR_CACHE_DIR" not in os.environ:
+        cache_dir = Path(__file__).parent / "weights" / "compile_cache" / f"{model_name}_t{tile}_{dtype}"
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        os.environ["TORCHINDUCTOR_CACHE_DIR"] = str(cache_dir)
+
+    if backend == "tensorrt":
+        if torch_tensorrt is not None:
+            upsampler.model = torch.compile(
+                upsampler.model,
+                backend="torch_tensorrt",
+                options={"enabled_precisions": {torch.half if upsampler.half else torch.float}},
+            )
+            return
+        print("Warning: torch_tensorrt not installed, falling back to inductor", file=sys.stderr)
+
+    upsampler.model = torch.compile(upsampler.model, mode="reduce-overhead", fullgraph=True)
+
+
+def _tile_window(upsampler: RealESRGANer) -> tuple:
+    """(tile, window) used by tiled_upscale; tile is rounded up to the model's mod scale."""
+    mod_scale = _mod_scale(upsampler)
+    tile = -(-upsampler.tile_size // mod_scale) * mod_scale
+    return tile, tile + 2 * upsampler.tile_pad
+
+
+def _calibration_tiles(calibration_dir: Optional[Path], window: int):
+    """Yield float32 RGB [3, window, window] center crops of calibration pages."""
+    if calibration_dir is None or not calibration_dir.is_dir():
+        return
+    paths = [p for p in sorted(calibration_dir.iterdir()) if p.suffix.lower() in IMAGE_EXTENSIONS]
+    for path in paths[:MAX_CALIBRATION_IMAGES]:
+        img = decode_image(path)
+        if not _is_8bit_bgr_or_gray(img):
+            continue
+        if img.ndim == 2:
+            # Scanned books are mostly grayscale; tiles are run as RGB
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        h, w = img.shape[:2]
+        top, left = max((h - window) // 2, 0), max((w - window) // 2, 0)
+        crop = img[top:top + window, left:left + window]
+        crop = cv2.copyMakeBorder(
+            crop, 0, window - crop.shape[0], 0, window - crop.shape[1], cv2.BORDER_REPLICATE
+        )
+        yield torch.from_numpy(crop[:, :, ::-1].copy()).permute(2, 0, 1).float().div_(255.0)
+
+
+def make_int8_calibrator(calibration_dir: Optional[Path], cache_path: Path, window: int, batch: int, device):
+    """Entropy calibrator fed with page tiles, cached at cache_path."""
+
+    class TileCalibrator(trt.IInt8EntropyCalibrator2):
+        def __init__(self):
+            super().__init__()
+            self.tiles = _calibration_tiles(calibration_dir, window)
+            self.buffer = torch.empty((batch, 3, window, window), dtype=torch.float32, device=device)
+
+        def get_batch_size(self):
+            return batch
+
+        def get_batch(self, names):
+            count = 0
+            for tile in self.tiles:
+                self.buffer[count].copy_(tile)
+                count += 1
+                if count == batch:
+                    break
+            if count == 0:
+                return None
+            # Pad a final partial batch by repeating its tiles
+            for j in range(count, batch):
+                self.buffer[j].copy_(self.buffer[j % count])
+            return [int(self.buffer.data_ptr())]
+
+        def read_calibration_cache(self):
+            return cache_path.read_bytes() if cache_path.exists() else None
+
+        def write_calibration_cache(self, cache):
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            cache_path.write_bytes(bytes(cache))
+
+    return TileCalibrator()
+
+
+def build_trt_engine(model, engine_path: Path, window: int, max_batch: int, fp16: bool, calibrator=None) -> None:
+    """Export the model to ONNX and serialize a TensorRT engine for [1..max_batch, 3, window, window] input."""
+    export_model = copy.deepcopy(model).float().eval()
+    device = next(export_model.parameters()).device
+    dummy = torch.zeros((1, 3, window, window), device=device)
+
+    export_kwargs = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    onnx_buf = io.BytesIO()
+    torch.onnx.export(
+        export_model,
+        dummy,
+        onnx_buf,
+        input_names=["input"],
+        output_names=["output"],
+        dynamic_axes={"input": {0: "batch"}, "output": {0: "batch"}},
+        opset_version=17,
+        **export_kwargs,
+    )
+    del export_model
+
+    logger = trt.Logger(trt.Logger.WARNING)
+    builder = trt.Builder(logger)
+    network = builder.create_network(1 << int(trt.NetworkDefinitionCreationFlag.EXPLICIT_BATCH))
+    parser = trt.OnnxParser(network, logger)
+    if not parser.parse(onnx_buf.getvalue()):
+        errors = "; ".join(str(parser.get_error(i)) for i in range(parser.num_errors))
+        raise RuntimeError(f"TensorRT ONNX parse failed: {errors}")
+
+    config = builder.create_builder_config()
+    if fp16:
+        config.set_flag(trt.BuilderFlag.FP16)
+    profile = builder.create_optimization_profile()
+    profile.set_shape("input", (1, 3, window, window), (max_batch, 3, window, window), (max_batch, 3, window, window))
+    config.add_optimization_profile(profile)
+    if calibrator is not None:
+        config.set_flag(trt.BuilderFlag.INT8)
+        config.int8_calibrator = calibrator
+        config.set_calibration_profile(profile)
+
+    serialized = builder.build_serialized_network(network, config)
+    if serialized is None:
+        raise RuntimeError("TensorRT engine build failed")
+
+    engine_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = engine_path.with_suffix(".tmp")
+    tmp_path.write_bytes(bytes(serialized))
+    os.replace(tmp_path, engine_path)
+
+
+class TensorRTModel:
+    """Drop-in for upsampler.model that runs tile-shaped batches through a TensorRT engine."""
+
+    def __init__(self, engine_path: Path, fallback, window: int, max_batch: int, netscale: int):
+        runtime = trt.Runtime(trt.Logger(trt.Logger.WARNING))
+        self.engine = runtime.deserialize_cuda_engine(engine_path.read_bytes())
+        if self.engine is None:
+            raise RuntimeError(f"Failed to load TensorRT engine: {engine_path}")
+        self.context = self.engine.create_execution_context()
+        self.fallback = fallback
+        self.window = window
+        self.max_batch = max_batch
+
+        # Output buffer reused across calls; callers consume it before the next call
+        device = next(fallback.parameters()).device
+        out_window = window * netscale
+        self.output = torch.empty((max_batch, 3, out_window, out_window), dtype=torch.float32, device=device)
+
+    def __call__(self, x):
+        batch = x.shape[0]
+        if tuple(x.shape[1:]) != (3, self.window, self.window) or batch > self.max_batch:
+            return self.fallback(x)
+
+        inp = x.float().contiguous()
+        self.context.set_input_shape("input", tuple(inp.shape))
+        self.context.set_tensor_address("input", inp.data_ptr())
+        self.context.set_tensor_address("output", self.output.data_ptr())
+        # Enqueue on torch's current stream so ordering with surrounding ops holds
+        if not self.context.execute_async_v3(torch.cuda.current_stream(x.device).cuda_stream):
+            raise RuntimeError("TensorRT execution failed")
+        return self.output[:batch].to(x.dtype)
+
+
+def load_trt_engine(
+    upsampler: RealESRGANer,
+    model_name: str,
+    max_batch: int,
+    int8: bool = False,
+    calibration_dir: Optional[Path] = None,
+) -> None:
+    """Route tiled inference through a cached TensorRT engine, falling back to PyTorch with a warning."""
+    if trt is None or torch.device(upsampler.device).type != "cuda":
+        print("Warning: TensorRT or CUDA not available, using PyTorch", file=sys.stderr)
+        return
+    if upsampler.tile_size <= 0:
+        print("Warning: --trt needs tiling (--tile > 0), using PyTorch", file=sys.stderr)
+        return
+
+    if int8 and model_name not in INT8_MODELS:
+        print(f"Warning: INT8 is not supported for {model_name}, ignoring --int8", file=sys.stderr)
+        int8 = False
+
+    tile, window = _tile_window(upsampler)
+    precision = ("int8-" if int8 else "") + ("fp16" if upsampler.half else "fp32")
+    key = "|".join([
+        model_name,
+        f"w{window}",
+        f"b{max_batch}",
+        precision,
+        trt.__version__,
+        torch.cuda.get_device_name(upsampler.device),
+    ])
+    digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+    engine_path = (
+        Path(__file__).parent / "weights" / "trt"
+        / f"{model_name}_t{tile}_s{upsampler.scale}_{precision}_{digest}.engine"
+    )
+
+    calibrator = None
+    if int8 and not engine_path.exists():
+        cache_path = engine_path.with_suffix(".calib")
+        if cache_path.exists() or next(_calibration_tiles(calibration_dir, window), None) is not None:
+            calibrator = make_int8_calibrator(calibration_dir, cache_path, window, max_batch, upsampler.device)
         else:
-            # Download to script's weights directory
-            if not download_model(model_filename, model_path):
-                raise FileNotFoundError(f"Model weights not found and download failed: {model_filename}")
-    
-    return model, netscale, str(model_path)
+            print("Warning: --int8 needs calibration images (8-bit BGR or grayscale) on first build, ignoring", file=sys.stderr)
+            load_trt_engine(upsampler, model_name, max_batch)
+            return
 
+    try:
+        if not engine_path.exists():
+            print(f"Building TensorRT engine: {engine_path.name}...", file=sys.stderr)
+            build_trt_engine(upsampler.model, engine_path, window, max_batch, upsampler.half, calibrator)
+        upsampler.model = TensorRTModel(engine_path, upsampler.model, window, max_batch, upsampler.scale)
+    except (RuntimeError, OSError) as e:
+        print(f"Warning: TensorRT engine unavailable ({e}), using PyTorch", file=sys.stderr)
 
-def upscale_image(
-    input_path: Path,
-    output_path: Path,
+
+def build_upsampler(
+    model_name: str = "realesrgan-x4plus",
     scale: int = 2,
     tile: int = 400,
     gpu_id: int = 0,
-    model_name: str = "realesrgan-x4plus",
     fp32: bool = False,
-) -> dict:
-    """Upscale a single image."""
-    start_time = time.time()
-
+    channels_last: bool = False,
+    compile_backend: Optional[str] = None,
+    tensorrt: bool = False,
+    tile_batch: int = 1,
+    int8: bool = False,
+    calibration_dir: Optional[Path] = None,
+    warmup: bool = False,
+) -> RealESRGANer:
+    """Load model weights and build a reusable upsampler."""
     # Load model
     model, netscale, model_path = get_model(model_name, scale)
 
-    # Calculate output scale (model scale may differ from requested scale)
-    outscale = scale
+    if fp32:
+        # Allow TF32 Tensor Cores for FP32 convolutions/matmuls on Ampere+
+        torch.set_float32_matmul_precision("high")
+        torch.backends.cuda.matmul.allow_tf32 = True
+        torch.backends.cudnn.allow_tf32 = True
+
+    upsampler = RealESRGANer(
+        scale=netscale,
+        model_path=model_path,
+        model=model,
+        tile=tile,
+        tile_pad=10,
+        pre_pad=0,
+        half=not fp32,
+        device=f"cuda:{gpu_id}" if torch.cuda.is_available() else "cpu",
+    )
+
+    # NHWC lets cuDNN pick Tensor Core kernels; opt-in since RRDB can regress on some GPUs
+    upsampler.channels_last = channels_last
+    if channels_last:
+        upsampler.model = upsampler.model.to(memory_format=torch.channels_last)
+
+    if compile_backend:
+        compile_model(upsampler, model_name, tile, compile_backend)
+
+    # Tiles per forward pass when an image is split by tiled_upscale; -t is
+    # sized for one tile's activations, so more is opt-in
+    upsampler.tile_batch = tile_batch
+    if tensorrt or int8:
+        load_trt_engine(upsampler, model_name, tile_batch, int8, calibration_dir)
+
+    # Dedicated allocator pool for inference activations, kept for the upsampler's lifetime
+    upsampler.mem_pool = None
+    if torch.device(upsampler.device).type == "cuda" and hasattr(torch.cuda, "MemPool"):
+        try:
+            upsampler.mem_pool = torch.cuda.MemPool(use_on_oom=True)
+        except TypeError:
+            upsampler.mem_pool = torch.cuda.MemPool()
+
+    if warmup:
+        warmup_upsampler(upsampler)
+
+    return upsampler
+
+
+def warmup_upsampler(upsampler: RealESRGANer) -> None:
+    """Run one dummy batch of tiles so autotuning happens before the first page."""
+    if upsampler.tile_size <= 0:
+        # No fixed tile shape to warm up for
+        return
+
+    _, window = _tile_window(upsampler)
+    dtype = torch.half if upsampler.half else torch.float32
+    memory_format = _memory_format(upsampler)
+    dummy = torch.zeros(
+        (upsampler.tile_batch, 3, window, window), dtype=dtype, device=upsampler.device
+    ).contiguous(memory_format=memory_format)
+
+    with _mem_pool_context(upsampler), torch.inference_mode():
+        upsampler.model(dummy)
+    if torch.device(upsampler.device).type == "cuda":
+        torch.cuda.synchronize(upsampler.device)
+
+
+def _mem_pool_context(upsampler: RealESRGANer):
+    """Route this thread's CUDA allocations to the upsampler's pool, if any."""
+    if upsampler.mem_pool is None:
+        return contextlib.nullcontext()
+    return torch.cuda.use_mem_pool(upsampler.mem_pool, device=upsampler.device)
+
+
+def _memory_format(upsampler: RealESRGANer):
+    return torch.channels_last if upsampler.channels_last else torch.contiguous_format
+
+
+def _mod_scale(upsampler: RealESRGANer) -> int:
+    """Multiple the model's input sides are padded to (its pixel-unshuffle factor)."""
+    return {2: 2, 1: 4}.get(upsampler.scale, 1)
+
+
+def _to_model_input(upsampler: RealESRGANer, host):
+    """Upload uint8 [B, H, W, 3] BGR or [B, H, W] gray to a [B, 3, H, W] RGB model input."""
+    if torch.device(upsampler.device).type == "cuda" and not host.is_pinned():
+        # Pinned memory lets the host-to-device copy run asynchronously
+        host = host.pin_memory()
+    x = host.to(upsampler.device, non_blocking=True)
+    if x.dim() == 3:
+        # Gray -> RGB on device
+        x = x.unsqueeze(1).expand(-1, 3, -1, -1)
+    else:
+        # BGR -> RGB on device
+        x = x.permute(0, 3, 1, 2)[:, [2, 1, 0]]
+    x = x.float().div_(255.0)
+    return x.half() if upsampler.half else x
+
+
+def _is_oom(error: RuntimeError) -> bool:
+    """Whether a RuntimeError is a CUDA out-of-memory error."""
+    return "out of memory" in str(error).lower()
 
-    # Check for model weights
-    if not os.path.exists(model_path):
-        # Try alternate locations
-        alt_paths = [
-            f"~/.cache/realesrgan/{os.path.basename(model_path)}",
-            f"/usr/share/realesrgan/{os.path.basename(model_path)}",
-        ]
-        for alt in alt_paths:
-            alt = os.path.expanduser(alt)
-            if os.path.exists(alt):
-                model_path = alt
-                break
+
+def _success_result(
+    input_path,
+    output_path,
+    original_size,
+    output_size,
+    scale: int,
+    model_name: str,
+    elapsed: float,
+) -> dict:
+    """Result dict reported for one upscaled image."""
+    return {
+        "input_path": str(input_path),
+        "output_path": str(output_path),
+        "original_size": list(original_size),
+        "output_size": list(output_size),
+        "scale": scale,
+        "model": model_name,
+        "processing_time": elapsed,
+        "exit_code": EXIT_SUCCESS,
+    }
+
+
+def write_image(
+    path: Path,
+    img,
+    jpeg_quality: int = DEFAULT_JPEG_QUALITY,
+    png_compression: Optional[int] = DEFAULT_PNG_COMPRESSION,
+) -> bool:
+    """cv2.imwrite with encoder settings by suffix; False if the file was not written."""
+    suffix = path.suffix.lower()
+    if suffix in (".jpg", ".jpeg"):
+        params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality, cv2.IMWRITE_JPEG_OPTIMIZE, 0]
+        if img.dtype == np.uint16:
+            # JPEG is 8-bit only; cv2 would saturate rather than rescale
+            img = (img >> 8).astype(np.uint8)
+    elif suffix == ".png" and png_compression is not None:
+        params = [cv2.IMWRITE_PNG_COMPRESSION, png_compression]
+    else:
+        params = []
 
     try:
-        # Initialize upsampler
-        upsampler = RealESRGANer(
-            scale=netscale,
-            model_path=model_path,
-            model=model,
-            tile=tile,
-            tile_pad=10,
-            pre_pad=0,
-            half=not fp32,
-            device=f"cuda:{gpu_id}" if torch.cuda.is_available() else "cpu",
-        )
-    except RuntimeError as e:
-        if "CUDA" in str(e) or "GPU" in str(e):
-            return {"error": str(e), "exit_code": EXIT_GPU_ERROR}
-        raise
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return cv2.imwrite(str(path), img, params)
+    except (OSError, cv2.error):
+        return False
+
+
+def _write_error(output_path) -> dict:
+    return {"error": f"Failed to write image: {output_path}", "exit_code": EXIT_OUTPUT_ERROR}
+
+
+def run_upscale(
+    upsampler: RealESRGANer,
+    input_path: Path,
+    output_path: Path,
+    scale: int = 2,
+    model_name: str = "realesrgan-x4plus",
+    jpeg_quality: int = DEFAULT_JPEG_QUALITY,
+    png_compression: Optional[int] = DEFAULT_PNG_COMPRESSION,
+) -> dict:
+    """Upscale a single image with an already-built upsampler."""
+    start_time = time.time()
+
+    # Calculate output scale (model scale may differ from requested scale)
+    outscale = scale
 
     # Read image
-    img = cv2.imread(str(input_path), cv2.IMREAD_UNCHANGED)
+    img = decode_image(input_path)
     if img is None:
         return {"error": f"Failed to read image: {input_path}", "exit_code": EXIT_INPUT_NOT_FOUND}
 
@@ -216,44 +658,717 @@ def upscale_image(
 
     try:
         # Upscale
-        output, _ = upsampler.enhance(img, outscale=outscale)
+        output = batch_upscale(upsampler, [img], batch_size=1, outscale=outscale)[0]
     except RuntimeError as e:
-        if "out of memory" in str(e).lower():
+        if _is_oom(e):
             return {"error": "Out of memory", "exit_code": EXIT_OOM}
         raise
 
     # Save output
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    cv2.imwrite(str(output_path), output)
+    if not write_image(output_path, output, jpeg_quality, png_compression):
+        return _write_error(output_path)
 
     elapsed = time.time() - start_time
-    output_size = output.shape[:2]
+    return _success_result(input_path, output_path, original_size, output.shape[:2], scale, model_name, elapsed)
 
-    return {
-        "input_path": str(input_path),
-        "output_path": str(output_path),
-        "original_size": list(original_size),
-        "output_size": list(output_size),
-        "scale": scale,
-        "model": model_name,
-        "processing_time": elapsed,
-        "exit_code": EXIT_SUCCESS,
-    }
+
+def parse_raw_shape(spec: str) -> tuple:
+    """Parse an HxWxC raw image shape such as 3508x2480x3."""
+    try:
+        dims = tuple(int(d) for d in spec.lower().split("x"))
+    except ValueError:
+        dims = ()
+    if len(dims) != 3 or min(dims) <= 0 or dims[2] not in (1, 3, 4):
+        raise argparse.ArgumentTypeError(f"invalid raw shape (expected HxWxC, C in 1/3/4): {spec}")
+    return dims
+
+
+def run_upscale_raw(
+    upsampler: RealESRGANer,
+    shape: tuple,
+    output_path: Optional[Path] = None,
+    scale: int = 2,
+    model_name: str = "realesrgan-x4plus",
+    jpeg_quality: int = DEFAULT_JPEG_QUALITY,
+    png_compression: Optional[int] = DEFAULT_PNG_COMPRESSION,
+) -> dict:
+    """Upscale one raw uint8 HxWxC (BGR) image from stdin, to stdout when output_path is None."""
+    start_time = time.time()
+
+    h, w, c = shape
+    data = bytearray(h * w * c)
+    view = memoryview(data)
+    filled = 0
+    while filled < len(data):
+        n = sys.stdin.buffer.readinto(view[filled:])
+        if not n:
+            return {
+                "error": f"Expected {len(data)} bytes on stdin, got {filled}",
+                "exit_code": EXIT_INPUT_NOT_FOUND,
+            }
+        filled += n
+    img = np.frombuffer(data, dtype=np.uint8).reshape((h, w) if c == 1 else (h, w, c))
+
+    try:
+        output = batch_upscale(upsampler, [img], batch_size=1, outscale=scale)[0]
+    except RuntimeError as e:
+        if _is_oom(e):
+            return {"error": "Out of memory", "exit_code": EXIT_OOM}
+        raise
+
+    if output_path is None:
+        sys.stdout.buffer.write(np.ascontiguousarray(output).data)
+        sys.stdout.buffer.flush()
+    elif not write_image(output_path, output, jpeg_quality, png_compression):
+        return _write_error(output_path)
+
+    elapsed = time.time() - start_time
+    return _success_result("-", output_path or "-", (h, w), output.shape[:2], scale, model_name, elapsed)
+
+
+def _is_8bit_bgr_or_gray(img) -> bool:
+    """Whether an image is 8-bit BGR or grayscale (the inputs handled on the device)."""
+    if img is None or img.dtype != np.uint8:
+        return False
+    return img.ndim == 2 or (img.ndim == 3 and img.shape[2] == 3)
+
+
+def _is_batchable(upsampler: RealESRGANer, img) -> bool:
+    """Whether an image can be stacked with others: 8-bit BGR or gray, within one tile."""
+    if not _is_8bit_bgr_or_gray(img):
+        return False
+    h, w = img.shape[:2]
+    return upsampler.tile_size == 0 or max(h, w) <= upsampler.tile_size
+
+
+def enhance_fixed_tiles(upsampler: RealESRGANer, img, outscale=None):
+    """RealESRGANer.enhance with tiled inputs padded to a multiple of the tile size."""
+    # Same-shaped edge tiles let cudnn.benchmark reuse its algorithm choice;
+    # images within one tile aren't tiled, so they stay unpadded
+    tile = upsampler.tile_size
+    h, w = img.shape[:2]
+    tiled = tile > 0 and (h > tile or w > tile)
+    pad_h = -h % tile if tiled else 0
+    pad_w = -w % tile if tiled else 0
+    # enhance prints tile progress to stdout, which carries JSON results or
+    # raw pixels for the caller
+    with contextlib.redirect_stdout(sys.stderr):
+        if not (pad_h or pad_w):
+            output, _ = upsampler.enhance(img, outscale=outscale)
+            return output
+
+        padded = cv2.copyMakeBorder(img, 0, pad_h, 0, pad_w, cv2.BORDER_REFLECT_101)
+        output, _ = upsampler.enhance(padded)
+    netscale = upsampler.scale
+    output = output[:h * netscale, :w * netscale]
+
+    if outscale is not None and outscale != float(netscale):
+        output = cv2.resize(output, (int(w * outscale), int(h * outscale)), interpolation=cv2.INTER_LANCZOS4)
+    return output
+
+
+def _to_gray(x, dim: int):
+    """Collapse an RGB channel dim to luma with cv2's BGR2GRAY weights."""
+    shape = [1] * x.dim()
+    shape[dim] = 3
+    weights = torch.tensor([0.299, 0.587, 0.114], dtype=x.dtype, device=x.device).view(shape)
+    return (x * weights).sum(dim)
+
+
+def _window_starts(n: int, tile: int, win: int) -> list:
+    """Window offsets along one axis, with the last window ending at n."""
+    last = max(n - win, 0)
+    return sorted({min(k * tile, last) for k in range(-(-last // tile) + 1)})
+
+
+def tiled_upscale(upsampler: RealESRGANer, img, batch_size: int = 4, outscale=None):
+    """Upscale a large 8-bit BGR or grayscale image as Hann-blended batches of tiles."""
+    netscale = upsampler.scale
+    mod_scale = _mod_scale(upsampler)
+    tile, win = _tile_window(upsampler)
+    h, w = img.shape[:2]
+    gray = img.ndim == 2
+    memory_format = _memory_format(upsampler)
+
+    x = _to_model_input(upsampler, torch.from_numpy(img).unsqueeze(0))
+    # Mod padding as in enhance; window offsets then stay on the model's
+    # pixel-unshuffle grid
+    if h % mod_scale or w % mod_scale:
+        x = torch.nn.functional.pad(x, (0, -w % mod_scale, 0, -h % mod_scale), "reflect")
+    hp, wp = x.shape[2:]
+    starts_y, starts_x = _window_starts(hp, tile, win), _window_starts(wp, tile, win)
+    if hp < win or wp < win:
+        x = torch.nn.functional.pad(x, (0, max(win - wp, 0), 0, max(win - hp, 0)), "replicate")
+
+    # The blend mask is an outer product over a grid, so its normalizer
+    # factors into one 1-D sum per axis
+    out_win = win * netscale
+    window = torch.hann_window(out_win, periodic=False, device=x.device).clamp_min_(1e-3)
+    norm_y = torch.zeros(x.shape[2] * netscale, device=x.device)
+    norm_x = torch.zeros(x.shape[3] * netscale, device=x.device)
+    for y in starts_y:
+        norm_y[y * netscale:y * netscale + out_win] += window
+    for xx in starts_x:
+        norm_x[xx * netscale:xx * netscale + out_win] += window
+    # Blend in float32 even for FP16 tiles: the clamped window product falls
+    # to ~1e-6 at image edges, which is subnormal in half precision
+    mask = torch.outer(window, window)
+
+    coords = [(y, xx) for y in starts_y for xx in starts_x]
+    with torch.inference_mode():
+        canvas = torch.zeros((3, norm_y.numel(), norm_x.numel()), device=x.device)
+        for start in range(0, len(coords), batch_size):
+            chunk = coords[start:start + batch_size]
+            batch = torch.stack([x[0, :, y:y + win, xx:xx + win] for y, xx in chunk])
+            out = upsampler.model(batch.contiguous(memory_format=memory_format))
+            for (y, xx), out_tile in zip(chunk, out):
+                y, xx = y * netscale, xx * netscale
+                canvas[:, y:y + out_win, xx:xx + out_win].add_(out_tile * mask)
+
+        rows, cols = slice(0, h * netscale), slice(0, w * netscale)
+        canvas = canvas[:, rows, cols]
+        canvas.div_(norm_y[rows, None]).div_(norm_x[None, cols])
+        if gray:
+            canvas = _to_gray(canvas.clamp_(0, 1), 0)
+        canvas = canvas.clamp_(0, 1).mul_(255.0).round_().to(torch.uint8)
+        if gray:
+            output = canvas.cpu().numpy()
+        else:
+            output = canvas[[2, 1, 0]].permute(1, 2, 0).contiguous().cpu().numpy()
+
+    if outscale is not None and outscale != float(netscale):
+        output = cv2.resize(output, (int(w * outscale), int(h * outscale)), interpolation=cv2.INTER_LANCZOS4)
+    return output
+
+
+def enhance_gpu_tail(upsampler: RealESRGANer, batch, out_h: int, out_w: int, gray: bool = False):
+    """Run the model and quantize to uint8 BGR (or gray) on the device."""
+    with torch.inference_mode():
+        out = upsampler.model(batch)[:, :, :out_h, :out_w].float().clamp_(0, 1)
+        if gray:
+            return _to_gray(out, 1).clamp_(0, 1).mul_(255.0).round_().to(torch.uint8)
+        out = out.mul_(255.0).round_().to(torch.uint8)
+        return out[:, [2, 1, 0]].permute(0, 2, 3, 1).contiguous()
+
+
+def batch_upscale(upsampler: RealESRGANer, img_list: list, batch_size: int = 4, outscale=None) -> list:
+    """Upscale a list of images, stacking same-sized images into one forward pass."""
+    # inference_mode also covers RealESRGANer.enhance fallbacks, which only use no_grad
+    with _mem_pool_context(upsampler), torch.inference_mode():
+        return _batch_upscale(upsampler, img_list, batch_size, outscale)
+
+
+def _batch_upscale(upsampler: RealESRGANer, img_list: list, batch_size: int, outscale) -> list:
+    outputs = [None] * len(img_list)
+    netscale = upsampler.scale
+    mod_scale = _mod_scale(upsampler)
+    pin = torch.device(upsampler.device).type == "cuda"
+    memory_format = _memory_format(upsampler)
+
+    # Group batchable images by shape (grayscale and BGR separately)
+    groups = {}
+    for idx, img in enumerate(img_list):
+        if _is_batchable(upsampler, img):
+            groups.setdefault(img.shape, []).append(idx)
+        elif _is_8bit_bgr_or_gray(img):
+            outputs[idx] = tiled_upscale(upsampler, img, batch_size=upsampler.tile_batch, outscale=outscale)
+        else:
+            outputs[idx] = enhance_fixed_tiles(upsampler, img, outscale=outscale)
+
+    for shape, indices in groups.items():
+        h, w = shape[:2]
+        gray = len(shape) == 2
+        pad_h, pad_w = -h % mod_scale, -w % mod_scale
+
+        for start in range(0, len(indices), batch_size):
+            chunk = indices[start:start + batch_size]
+            # Stage into pinned memory so the host-to-device copy can run asynchronously
+            host = torch.empty((len(chunk), *shape), dtype=torch.uint8, pin_memory=pin)
+            for j, i in enumerate(chunk):
+                host[j].numpy()[...] = img_list[i]
+            batch = _to_model_input(upsampler, host)
+            if pad_h or pad_w:
+                batch = torch.nn.functional.pad(batch, (0, pad_w, 0, pad_h), "reflect")
+            batch = batch.contiguous(memory_format=memory_format)
+
+            out = enhance_gpu_tail(upsampler, batch, h * netscale, w * netscale, gray).cpu().numpy()
+
+            for i, img_out in zip(chunk, out):
+                if outscale is not None and outscale != float(netscale):
+                    img_out = cv2.resize(
+                        img_out,
+                        (int(w * outscale), int(h * outscale)),
+                        interpolation=cv2.INTER_LANCZOS4,
+                    )
+                outputs[i] = img_out
+
+    return outputs
+
+
+def _image_area(path: Path) -> tuple:
+    """(H*W, H, W) from the image header only, without decoding pixels."""
+    try:
+        with Image.open(path) as im:
+            w, h = im.size
+    except (OSError, Image.DecompressionBombError):
+        # Unreadable files sort last; the decode error is reported later
+        return (0, 0, 0)
+    return (h * w, h, w)
+
+
+def order_jobs_by_shape(jobs: list) -> list:
+    """Order jobs largest first so same-sized images are adjacent."""
+    if Image is None:
+        return jobs
+    # Only headers are read here (pixels are decoded by cv2), so Pillow's
+    # decompression-bomb limit would just reject large, valid pages
+    max_pixels, Image.MAX_IMAGE_PIXELS = Image.MAX_IMAGE_PIXELS, None
+    try:
+        return sorted(jobs, key=lambda job: _image_area(job[0]), reverse=True)
+    finally:
+        Image.MAX_IMAGE_PIXELS = max_pixels
+
+
+@functools.lru_cache(maxsize=1)
+def _turbojpeg():
+    """Shared TurboJPEG decoder, or None if PyTurboJPEG/libturbojpeg is unavailable."""
+    if TurboJPEG is None:
+        return None
+    try:
+        return TurboJPEG()
+    except (OSError, RuntimeError):
+        return None
+
+
+def decode_image(path: Path):
+    """Decode an image like cv2.imread(IMREAD_UNCHANGED); None on failure."""
+    try:
+        data = path.read_bytes()
+    except OSError:
+        return None
+
+    jpeg = _turbojpeg() if path.suffix.lower() in (".jpg", ".jpeg") else None
+    if jpeg is not None:
+        try:
+            colorspace = jpeg.decode_header(data)[3]
+            if colorspace == TJCS_GRAY:
+                # Keep grayscale single-channel, as IMREAD_UNCHANGED does
+                return jpeg.decode(data, pixel_format=TJPF_GRAY)[:, :, 0]
+            return jpeg.decode(data, pixel_format=TJPF_BGR)
+        except (OSError, ValueError, IndexError):
+            pass
+
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+
+
+def _write_images(jobs: list, outputs: list, jpeg_quality: int, png_compression: Optional[int]) -> list:
+    """Encode outputs to their job's output path; returns per-job write status."""
+    return [
+        output is None or write_image(output_path, output, jpeg_quality, png_compression)
+        for (_, output_path), output in zip(jobs, outputs)
+    ]
+
+
+def _finish_chunk(write, jobs: list, results: list) -> list:
+    """Wait for a chunk's writes and mark jobs whose output wasn't written."""
+    return [
+        result if written else _write_error(output_path)
+        for (_, output_path), result, written in zip(jobs, results, write.result())
+    ]
+
+
+def _upscale_alone(upsampler: RealESRGANer, img, outscale):
+    """Upscale one image without batching after an OOM; None if it still doesn't fit."""
+    if torch.device(upsampler.device).type == "cuda":
+        torch.cuda.empty_cache()
+    try:
+        return batch_upscale(upsampler, [img], batch_size=1, outscale=outscale)[0]
+    except RuntimeError as e:
+        if _is_oom(e):
+            return None
+        raise
+
+
+def _upscale_chunk(
+    upsampler: RealESRGANer,
+    jobs: list,
+    imgs: list,
+    scale: int,
+    model_name: str,
+    batch_size: int,
+) -> tuple:
+    """Upscale decoded images for a chunk of jobs; returns (results, outputs)."""
+    start_time = time.time()
+    results = [None] * len(jobs)
+    outputs = [None] * len(jobs)
+
+    pending = []
+    for idx, ((input_path, _), img) in enumerate(zip(jobs, imgs)):
+        if img is None:
+            results[idx] = {"error": f"Failed to read image: {input_path}", "exit_code": EXIT_INPUT_NOT_FOUND}
+        else:
+            pending.append(idx)
+
+    try:
+        upscaled = batch_upscale(upsampler, [imgs[idx] for idx in pending], batch_size=batch_size, outscale=scale)
+    except RuntimeError as e:
+        if not _is_oom(e):
+            raise
+        # Retry one image at a time so one oversized stack doesn't fail the whole chunk
+        upscaled = [_upscale_alone(upsampler, imgs[idx], scale) for idx in pending]
+
+    # Chunk compute time amortized over its images
+    elapsed = (time.time() - start_time) / max(len(pending), 1)
+    for idx, output in zip(pending, upscaled):
+        if output is None:
+            results[idx] = {"error": "Out of memory", "exit_code": EXIT_OOM}
+            continue
+        input_path, output_path = jobs[idx]
+        outputs[idx] = output
+        results[idx] = _success_result(
+            input_path, output_path, imgs[idx].shape[:2], output.shape[:2], scale, model_name, elapsed
+        )
+
+    return results, outputs
+
+
+def run_upscale_batch(
+    upsampler: RealESRGANer,
+    jobs: list,
+    scale: int = 2,
+    model_name: str = "realesrgan-x4plus",
+    batch_size: int = 4,
+    prefetch: int = 2,
+    jpeg_quality: int = DEFAULT_JPEG_QUALITY,
+    png_compression: Optional[int] = DEFAULT_PNG_COMPRESSION,
+):
+    """Upscale (input_path, output_path) pairs, decoding and encoding around the GPU; yields results in order."""
+    chunks = [jobs[i:i + batch_size] for i in range(0, len(jobs), batch_size)]
+
+    def submit_reads(chunk):
+        return [reader.submit(decode_image, input_path) for input_path, _ in chunk]
+
+    decode_workers = min(DECODE_WORKERS, os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=decode_workers) as reader, ThreadPoolExecutor(max_workers=1) as writer:
+        reads = deque(submit_reads(chunk) for chunk in chunks[:prefetch])
+        in_flight = None
+
+        for n, chunk in enumerate(chunks):
+            imgs = [future.result() for future in reads.popleft()]
+            if n + prefetch < len(chunks):
+                reads.append(submit_reads(chunks[n + prefetch]))
+
+            results, outputs = _upscale_chunk(upsampler, chunk, imgs, scale, model_name, batch_size)
+            del imgs
+            write = writer.submit(_write_images, chunk, outputs, jpeg_quality, png_compression)
+
+            # Report the previous chunk once its outputs are on disk
+            if in_flight is not None:
+                yield from _finish_chunk(*in_flight)
+            in_flight = (write, chunk, results)
+
+        if in_flight is not None:
+            yield from _finish_chunk(*in_flight)
+
+
+def upscale_image(
+    input_path: Path,
+    output_path: Path,
+    scale: int = 2,
+    tile: int = 400,
+    gpu_id: int = 0,
+    model_name: str = "realesrgan-x4plus",
+    fp32: bool = False,
+    channels_last: bool = False,
+    compile_backend: Optional[str] = None,
+    tensorrt: bool = False,
+    tile_batch: int = 1,
+    int8: bool = False,
+    calibration_dir: Optional[Path] = None,
+    warmup: bool = False,
+    jpeg_quality: int = DEFAULT_JPEG_QUALITY,
+    png_compression: Optional[int] = DEFAULT_PNG_COMPRESSION,
+) -> dict:
+    """Upscale a single image (one-shot: builds and discards the upsampler)."""
+    start_time = time.time()
+
+    try:
+        upsampler = build_upsampler(
+            model_name=model_name,
+            scale=scale,
+            tile=tile,
+            gpu_id=gpu_id,
+            fp32=fp32,
+            channels_last=channels_last,
+            compile_backend=compile_backend,
+            tensorrt=tensorrt,
+            tile_batch=tile_batch,
+            int8=int8,
+            calibration_dir=calibration_dir,
+            warmup=warmup,
+        )
+    except RuntimeError as e:
+        if "CUDA" in str(e) or "GPU" in str(e):
+            return {"error": str(e), "exit_code": EXIT_GPU_ERROR}
+        raise
+
+    if warmup:
+        # Warmup exists to move autotuning out of the timed page
+        start_time = time.time()
+
+    result = run_upscale(
+        upsampler,
+        input_path,
+        output_path,
+        scale=scale,
+        model_name=model_name,
+        jpeg_quality=jpeg_quality,
+        png_compression=png_compression,
+    )
+    if result.get("exit_code") == EXIT_SUCCESS:
+        # Report total time including model load (unless warming up), as before
+        result["processing_time"] = time.time() - start_time
+    return result
+
+
+def _serve_job(
+    upsampler: RealESRGANer,
+    job: dict,
+    scale: int,
+    model_name: str,
+    jpeg_quality: int,
+    png_compression: Optional[int],
+) -> dict:
+    """Run one {"input", "output", "scale"?} job received by serve()."""
+    if not isinstance(job, dict) or not isinstance(job.get("input"), str) or not isinstance(job.get("output"), str):
+        return {"error": "Job must be an object with string 'input' and 'output'", "exit_code": EXIT_INVALID_ARGS}
+
+    job_scale = job.get("scale", scale)
+    if type(job_scale) is not int or job_scale not in (2, 4):
+        return {"error": f"Invalid scale (expected 2 or 4): {job_scale!r}", "exit_code": EXIT_INVALID_ARGS}
+
+    input_path = Path(job["input"])
+    if not input_path.is_file():
+        return {"error": f"Input not found: {input_path}", "exit_code": EXIT_INPUT_NOT_FOUND}
+
+    try:
+        return run_upscale(
+            upsampler,
+            input_path,
+            Path(job["output"]),
+            scale=job_scale,
+            model_name=model_name,
+            jpeg_quality=jpeg_quality,
+            png_compression=png_compression,
+        )
+    except Exception as e:
+        # A bad job must not take the server down
+        return {"error": str(e), "exit_code": EXIT_ERROR}
+
+
+def _is_stale_socket(path: Path) -> bool:
+    """Whether path is a Unix socket that no server is listening on."""
+    try:
+        if not stat.S_ISSOCK(path.stat().st_mode):
+            return False
+    except OSError:
+        return False
+
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(str(path))
+    except ConnectionRefusedError:
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+    return False
+
+
+def serve(
+    upsampler: RealESRGANer,
+    socket_path: Path,
+    scale: int = 2,
+    model_name: str = "realesrgan-x4plus",
+    jpeg_quality: int = DEFAULT_JPEG_QUALITY,
+    png_compression: Optional[int] = DEFAULT_PNG_COMPRESSION,
+) -> None:
+    """Serve newline-delimited JSON upscale jobs on a Unix-domain socket until shut down."""
+    if _is_stale_socket(socket_path):
+        socket_path.unlink()
+    elif socket_path.exists():
+        raise FileExistsError(f"Socket path in use: {socket_path}")
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        server.bind(str(socket_path))
+        server.listen()
+        print(json.dumps({"listening": str(socket_path)}), flush=True)
+
+        # One connection at a time, since jobs share one GPU
+        running = True
+        while running:
+            conn, _ = server.accept()
+            with conn, conn.makefile("rwb") as stream:
+                try:
+                    for line in stream:
+                        if not line.strip():
+                            continue
+                        try:
+                            job = json.loads(line)
+                        except ValueError as e:
+                            # Malformed JSON or non-UTF-8 bytes
+                            result = {"error": f"Invalid job: {e}", "exit_code": EXIT_INVALID_ARGS}
+                        else:
+                            if isinstance(job, dict) and job.get("shutdown"):
+                                running = False
+                                result = {"exit_code": EXIT_SUCCESS}
+                            else:
+                                result = _serve_job(
+                                    upsampler, job, scale, model_name, jpeg_quality, png_compression
+                                )
+
+                        stream.write((json.dumps(result) + "\n").encode())
+                        stream.flush()
+                        if not running:
+                            break
+                except (BrokenPipeError, ConnectionResetError):
+                    # Client went away; keep serving others
+                    pass
+    finally:
+        server.close()
+        socket_path.unlink(missing_ok=True)
+
+
+def _upsampler_from_args(args, status=sys.stdout) -> RealESRGANer:
+    """Build the upsampler from CLI args, exiting with EXIT_GPU_ERROR on CUDA failure."""
+    try:
+        return build_upsampler(
+            model_name=args.model,
+            scale=args.scale,
+            tile=args.tile,
+            gpu_id=args.gpu,
+            fp32=args.fp32,
+            channels_last=args.channels_last,
+            compile_backend=args.compile,
+            tensorrt=args.trt,
+            tile_batch=max(args.tile_batch, 1),
+            int8=args.int8 is not None,
+            calibration_dir=Path(args.int8) if args.int8 else None,
+            warmup=args.warmup,
+        )
+    except RuntimeError as e:
+        if "CUDA" not in str(e) and "GPU" not in str(e):
+            raise
+        if args.json:
+            print(json.dumps({"error": str(e), "exit_code": EXIT_GPU_ERROR}), file=status)
+        else:
+            print(f"Error: {e}", file=sys.stderr)
+        sys.exit(EXIT_GPU_ERROR)
 
 
 def main():
     parser = argparse.ArgumentParser(description="RealESRGAN image upscaler")
-    parser.add_argument("-i", "--input", required=True, help="Input image or directory")
-    parser.add_argument("-o", "--output", required=True, help="Output path")
+    parser.add_argument("-i", "--input", help="Input image or directory")
+    parser.add_argument("-o", "--output", help="Output path")
     parser.add_argument("-s", "--scale", type=int, default=2, choices=[2, 4], help="Upscale factor")
     parser.add_argument("-t", "--tile", type=int, default=400, help="Tile size")
     parser.add_argument("-g", "--gpu", type=int, default=0, help="GPU device ID")
     parser.add_argument("--model", default="realesrgan-x4plus", help="Model name")
     parser.add_argument("--fp32", action="store_true", help="Use FP32 precision")
+    parser.add_argument("--channels-last", action="store_true", help="Use channels_last memory format")
+    parser.add_argument(
+        "--compile",
+        nargs="?",
+        const="inductor",
+        choices=["inductor", "tensorrt"],
+        help="Compile the model with torch.compile (default backend: inductor)",
+    )
+    parser.add_argument("--trt", action="store_true", help="Use a cached TensorRT engine for tiles")
+    parser.add_argument(
+        "--int8",
+        nargs="?",
+        const="",
+        metavar="CALIB_DIR",
+        help="Build the TensorRT engine with INT8 (anime model only), calibrated on CALIB_DIR pages",
+    )
+    parser.add_argument("--warmup", action="store_true", help="Warm up the model before the first image")
     parser.add_argument("--json", action="store_true", help="Output as JSON")
+    parser.add_argument("--out-format", choices=["png", "jpg"], help="Output format in directory mode")
+    parser.add_argument("--jpeg-quality", type=int, default=DEFAULT_JPEG_QUALITY, help="JPEG output quality (0-100)")
+    parser.add_argument(
+        "--png-compression",
+        type=int,
+        default=DEFAULT_PNG_COMPRESSION,
+        choices=range(10),
+        metavar="{0-9}",
+        help="PNG zlib compression level (default: OpenCV's fast level-1/RLE encoder)",
+    )
+    parser.add_argument("--batch", type=int, default=4, help="Images per forward pass in directory mode")
+    parser.add_argument("--tile-batch", type=int, default=1, help="Tiles of one image per forward pass")
+    parser.add_argument("--raw-in", type=parse_raw_shape, metavar="HxWxC", help="Read raw uint8 BGR pixels from stdin")
+    parser.add_argument("--raw-out", action="store_true", help="Write raw uint8 pixels to stdout")
+    parser.add_argument("--serve", metavar="SOCKET", help="Serve JSON jobs on a Unix-domain socket")
 
     args = parser.parse_args()
 
+    if not 0 <= args.jpeg_quality <= 100:
+        parser.error("--jpeg-quality must be between 0 and 100")
+    if args.raw_out and not args.raw_in:
+        parser.error("--raw-out requires --raw-in")
+    if args.input is None and not (args.raw_in or args.serve):
+        parser.error("-i/--input is required unless --raw-in or --serve is given")
+    if args.output is None and not (args.raw_out or args.serve):
+        parser.error("-o/--output is required unless --raw-out or --serve is given")
+
+    # Let cuDNN benchmark and cache the fastest conv algorithm per input shape
+    torch.backends.cudnn.benchmark = True
+
+    if args.serve:
+        socket_path = Path(args.serve)
+        if socket_path.exists() and not _is_stale_socket(socket_path):
+            # Refuse before loading the model rather than replacing a file or live server
+            if args.json:
+                print(json.dumps({"error": "Socket path in use", "exit_code": EXIT_INVALID_ARGS}))
+            else:
+                print(f"Error: Socket path is in use or not a socket: {socket_path}", file=sys.stderr)
+            sys.exit(EXIT_INVALID_ARGS)
+
+        upsampler = _upsampler_from_args(args)
+        serve(
+            upsampler,
+            socket_path,
+            scale=args.scale,
+            model_name=args.model,
+            jpeg_quality=args.jpeg_quality,
+            png_compression=args.png_compression,
+        )
+        sys.exit(EXIT_SUCCESS)
+
+    if args.raw_in:
+        # With --raw-out, stdout carries pixel data, so status goes to stderr
+        status = sys.stderr if args.raw_out else sys.stdout
+        upsampler = _upsampler_from_args(args, status)
+        result = run_upscale_raw(
+            upsampler,
+            args.raw_in,
+            None if args.raw_out else Path(args.output),
+            scale=args.scale,
+            model_name=args.model,
+            jpeg_quality=args.jpeg_quality,
+            png_compression=args.png_compression,
+        )
+
+        if args.json:
+            print(json.dumps(result), file=status)
+        elif result.get("exit_code", 1) == EXIT_SUCCESS:
+            print(f"Upscaled: stdin -> {result['output_path']} ({result['processing_time']:.2f}s)", file=status)
+        else:
+            print(f"Error: {result.get('error', 'Unknown error')}", file=sys.stderr)
+
+        sys.exit(result.get("exit_code", EXIT_ERROR))
+
     input_path = Path(args.input)
     output_path = Path(args.output)
 
@@ -274,6 +1389,15 @@ def main():
             gpu_id=args.gpu,
             model_name=args.model,
             fp32=args.fp32,
+            channels_last=args.channels_last,
+            compile_backend=args.compile,
+            tensorrt=args.trt,
+            tile_batch=max(args.tile_batch, 1),
+            int8=args.int8 is not None,
+            calibration_dir=Path(args.int8) if args.int8 else None,
+            warmup=args.warmup,
+            jpeg_quality=args.jpeg_quality,
+            png_compression=args.png_compression,
         )
 
         if args.json:
@@ -287,36 +1411,49 @@ def main():
 
     elif input_path.is_dir():
         # Process directory
-        results = []
-        image_extensions = {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tiff"}
+        total = 0
+        failed = 0
 
         output_path.mkdir(parents=True, exist_ok=True)
+        out_suffix = f".{args.out_format}" if args.out_format else None
+
+        # Build the upsampler once and reuse it for every file
+        upsampler = _upsampler_from_args(args)
+
+        jobs = order_jobs_by_shape([
+            (img_file, output_path / f"{img_file.stem}_upscaled{out_suffix or img_file.suffix}")
+            for img_file in sorted(input_path.iterdir())
+            if img_file.suffix.lower() in IMAGE_EXTENSIONS
+        ])
+        batch_results = run_upscale_batch(
+            upsampler,
+            jobs,
+            scale=args.scale,
+            model_name=args.model,
+            batch_size=max(args.batch, 1),
+            jpeg_quality=args.jpeg_quality,
+            png_compression=args.png_compression,
+        )
+
+        # Stream results as NDJSON: one line per image, then a summary line
+        for (img_file, _), result in zip(jobs, batch_results):
+            total += 1
+            ok = result.get("exit_code", 1) == EXIT_SUCCESS
+            if not ok:
+                failed += 1
 
-        for img_file in sorted(input_path.iterdir()):
-            if img_file.suffix.lower() in image_extensions:
-                out_file = output_path / f"{img_file.stem}_upscaled{img_file.suffix}"
-                result = upscale_image(
-                    img_file,
-                    out_file,
-                    scale=args.scale,
-                    tile=args.tile,
-                    gpu_id=args.gpu,
-                    model_name=args.model,
-                    fp32=args.fp32,
-                )
-                results.append(result)
-
-                if not args.json:
-                    if result.get("exit_code", 1) == EXIT_SUCCESS:
-                        print(f"Upscaled: {img_file.name} ({result['processing_time']:.2f}s)")
-                    else:
-                        print(f"Failed: {img_file.name} - {result.get('error', 'Unknown error')}", file=sys.stderr)
+            if args.json:
+                result.setdefault("input_path", str(img_file))
+                print(json.dumps(result), flush=True)
+            elif ok:
+                print(f"Upscaled: {img_file.name} ({result['processing_time']:.2f}s)")
+            else:
+                print(f"Failed: {img_file.name} - {result.get('error', 'Unknown error')}", file=sys.stderr)
 
         if args.json:
-            print(json.dumps({"results": results, "total": len(results)}))
+            print(json.dumps({"total": total, "failed": failed}))
 
         # Exit with error if any failed
-        failed = [r for r in results if r.get("exit_code", 1) != EXIT_SUCCESS]
         if failed:
             sys.exit(EXIT_ERROR)
 
@@ -0,0 +1,309 @@
+"""Check the bridge on CPU: batched/tiled paths against RealESRGANer.enhance, and its pure helpers."""
+
+import argparse
+import io
+import socket
+import urllib.request
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("basicsr")
+pytest.importorskip("realesrgan")
+pytest.importorskip("cv2")
+
+from basicsr.archs.rrdbnet_arch import RRDBNet  # noqa: E402
+from realesrgan import RealESRGANer  # noqa: E402
+
+import cv2  # noqa: E402
+
+from ai_bridge.realesrgan_bridge import (  # noqa: E402
+    EXIT_INPUT_NOT_FOUND,
+    EXIT_INVALID_ARGS,
+    _calibration_tiles,
+    _is_stale_socket,
+    _serve_job,
+    _to_model_input,
+    _window_starts,
+    batch_upscale,
+    decode_image,
+    download_model,
+    order_jobs_by_shape,
+    parse_raw_shape,
+    write_image,
+)
+
+# Receptive field of the tiny model below is ~20 input pixels; tile_pad
+# must cover it for tiled output to match a whole-image pass
+TILE_PAD = 24
+
+
+def make_upsampler(tmp_path, netscale: int, tile: int) -> RealESRGANer:
+    """Tiny random-weight RRDBNet wrapped the way build_upsampler does."""
+    torch.manual_seed(0)
+    model = RRDBNet(num_in_ch=3, num_out_ch=3, num_feat=8, num_block=1, num_grow_ch=4, scale=netscale)
+    with torch.no_grad():
+        # Default init is near-constant; spread the output over [0, 1]
+        model.conv_last.weight.mul_(10.0)
+        model.conv_last.bias.fill_(0.5)
+    weights = tmp_path / "tiny.pth"
+    torch.save({"params": model.state_dict()}, weights)
+
+    upsampler = RealESRGANer(
+        scale=netscale,
+        model_path=str(weights),
+        model=model,
+        tile=tile,
+        tile_pad=TILE_PAD,
+        pre_pad=0,
+        half=False,
+        device="cpu",
+    )
+    upsampler.channels_last = False
+    upsampler.tile_batch = 4
+    upsampler.mem_pool = None
+    return upsampler
+
+
+def random_image(shape, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, shape, dtype=np.uint8)
+
+
+@pytest.mark.parametrize("netscale", [2, 4])
+@pytest.mark.parametrize("channels", [3, 1])
+def test_single_tile_matches_enhance(tmp_path, netscale, channels):
+    upsampler = make_upsampler(tmp_path, netscale, tile=64)
+    # Odd sizes exercise mod padding; repeated shapes are stacked into one batch
+    shapes = [(37, 29), (40, 30), (37, 29), (64, 51)]
+    imgs = [random_image(s if channels == 1 else (*s, 3), seed=i) for i, s in enumerate(shapes)]
+
+    outputs = batch_upscale(upsampler, imgs, batch_size=4, outscale=netscale)
+
+    for img, output in zip(imgs, outputs):
+        expected, _ = upsampler.enhance(img, outscale=netscale)
+        assert output.shape == expected.shape
+        assert output.dtype == np.uint8
+        assert np.abs(output.astype(int) - expected).max() <= 1
+
+
+@pytest.mark.parametrize("netscale", [2, 4])
+@pytest.mark.parametrize("channels", [3, 1])
+def test_multi_tile_matches_enhance(tmp_path, netscale, channels):
+    upsampler = make_upsampler(tmp_path, netscale, tile=32)
+    shape = (150, 131)
+    img = random_image(shape if channels == 1 else (*shape, 3))
+
+    output = batch_upscale(upsampler, [img], batch_size=4, outscale=netscale)[0]
+
+    upsampler.tile_size = 0
+    expected, _ = upsampler.enhance(img, outscale=netscale)
+    assert output.shape == expected.shape
+
+    # Tile edges still inside the receptive field get a small Hann weight,
+    # so a few pixels may be off by more than rounding
+    diff = np.abs(output.astype(int) - expected)
+    assert diff.max() <= 4
+    assert diff.mean() < 0.1
+
+
+def test_to_model_input(tmp_path):
+    upsampler = make_upsampler(tmp_path, 2, tile=32)
+    bgr = random_image((2, 5, 7, 3))
+    gray = random_image((2, 5, 7), seed=1)
+
+    x = _to_model_input(upsampler, torch.from_numpy(bgr))
+    assert x.shape == (2, 3, 5, 7)
+    assert x.dtype == torch.float32
+    assert torch.allclose(x, torch.from_numpy(bgr[..., ::-1].copy()).permute(0, 3, 1, 2) / 255.0)
+
+    x = _to_model_input(upsampler, torch.from_numpy(gray))
+    assert x.shape == (2, 3, 5, 7)
+    for channel in range(3):
+        assert torch.allclose(x[:, channel], torch.from_numpy(gray) / 255.0)
+
+
+@pytest.mark.parametrize("n", [1, 47, 48, 49, 96, 100, 131, 500])
+def test_window_starts_cover_axis(n):
+    tile, win = 32, 48
+    starts = _window_starts(n, tile, win)
+    assert starts[0] == 0
+    assert starts == sorted(set(starts))
+    assert starts[-1] == max(n - win, 0)
+    # Consecutive windows overlap by at least the padding on each side
+    assert all(b - a <= tile for a, b in zip(starts, starts[1:]))
+
+
+def test_order_jobs_by_shape(tmp_path):
+    pytest.importorskip("PIL")
+    paths = {}
+    for name, shape in [("a", (10, 10)), ("b", (30, 20)), ("c", (10, 10))]:
+        paths[name] = tmp_path / f"{name}.png"
+        cv2.imwrite(str(paths[name]), random_image(shape))
+    paths["bad"] = tmp_path / "bad.png"
+    paths["bad"].write_bytes(b"not an image")
+    jobs = [(paths[name], tmp_path / f"{name}_out.png") for name in ["a", "bad", "b", "c"]]
+
+    # Largest first, name order kept within a size, unreadable files last
+    ordered = order_jobs_by_shape(jobs)
+    assert [job[0].stem for job in ordered] == ["b", "a", "c", "bad"]
+
+
+def test_parse_raw_shape():
+    assert parse_raw_shape("3508x2480x3") == (3508, 2480, 3)
+    assert parse_raw_shape("10X20X1") == (10, 20, 1)
+    for spec in ["10x20", "10x20x2", "0x20x3", "-1x20x3", "axbxc", "10x20x3x1"]:
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_raw_shape(spec)
+
+
+@pytest.mark.parametrize(
+    "job",
+    [
+        ["in.png", "out.png"],
+        {"input": 1, "output": "out.png"},
+        {"input": "in.png", "output": None},
+        {"input": "in.png"},
+    ],
+)
+def test_serve_job_rejects_malformed_jobs(job):
+    result = _serve_job(None, job, 2, "realesrgan-x4plus", 95, None)
+    assert result["exit_code"] == EXIT_INVALID_ARGS
+
+
+@pytest.mark.parametrize("scale", [3, 2.0, "2", True])
+def test_serve_job_rejects_bad_scale(tmp_path, scale):
+    job = {"input": str(tmp_path / "in.png"), "output": str(tmp_path / "out.png"), "scale": scale}
+    result = _serve_job(None, job, 2, "realesrgan-x4plus", 95, None)
+    assert result["exit_code"] == EXIT_INVALID_ARGS
+
+
+def test_serve_job_missing_input(tmp_path):
+    job = {"input": str(tmp_path / "missing.png"), "output": str(tmp_path / "out.png")}
+    result = _serve_job(None, job, 2, "realesrgan-x4plus", 95, None)
+    assert result["exit_code"] == EXIT_INPUT_NOT_FOUND
+
+
+def test_is_stale_socket(tmp_path):
+    path = tmp_path / "s.sock"
+    assert not _is_stale_socket(path)
+
+    # A regular file is never treated as a leftover socket
+    path.write_text("")
+    assert not _is_stale_socket(path)
+    path.unlink()
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(path))
+    server.listen()
+    try:
+        assert not _is_stale_socket(path)
+    finally:
+        server.close()
+    # Closed without unlinking, as after a crash
+    assert _is_stale_socket(path)
+
+
+@pytest.mark.parametrize("shape", [(24, 16), (24, 16, 3)])
+def test_decode_image_matches_imread(tmp_path, shape):
+    # JPEGs go through libjpeg-turbo when PyTurboJPEG is installed
+    path = tmp_path / "page.jpg"
+    cv2.imwrite(str(path), random_image(shape))
+
+    decoded = decode_image(path)
+    expected = cv2.imread(str(path), cv2.IMREAD_UNCHANGED)
+    assert decoded.shape == expected.shape == shape
+    assert decoded.dtype == np.uint8
+    assert np.abs(decoded.astype(int) - expected).max() <= 2
+
+
+def test_decode_image_failures(tmp_path):
+    assert decode_image(tmp_path / "missing.png") is None
+    bad = tmp_path / "bad.jpg"
+    bad.write_bytes(b"not an image")
+    assert decode_image(bad) is None
+
+
+def test_write_image_downscales_16bit_for_jpeg(tmp_path):
+    img = np.full((8, 8, 3), 0x8040, dtype=np.uint16)
+    path = tmp_path / "out.jpg"
+    assert write_image(path, img)
+    decoded = cv2.imread(str(path), cv2.IMREAD_UNCHANGED)
+    assert decoded.dtype == np.uint8
+    assert np.abs(decoded.astype(int) - 0x80).max() <= 2
+
+
+def test_write_image_png_levels(tmp_path):
+    img = random_image((16, 16, 3))
+    for level in [None, 0, 9]:
+        path = tmp_path / f"out_{level}.png"
+        assert write_image(path, img, png_compression=level)
+        assert np.array_equal(cv2.imread(str(path), cv2.IMREAD_UNCHANGED), img)
+
+
+def test_write_image_reports_failure(tmp_path):
+    # Parent "directory" is a regular file, so nothing can be written
+    blocker = tmp_path / "blocker"
+    blocker.write_text("")
+    assert not write_image(blocker / "out.png", random_image((4, 4, 3)))
+
+
+class FakeResponse(io.BytesIO):
+    def __init__(self, data: bytes, length: int):
+        super().__init__(data)
+        self.headers = {"Content-Length": str(length)}
+
+
+def fake_urlopen(data: bytes, length: int):
+    return lambda url, timeout=None: FakeResponse(data, length)
+
+
+def test_download_model_writes_complete_download(tmp_path, monkeypatch):
+    monkeypatch.setattr(urllib.request, "urlopen", fake_urlopen(b"weights", 7))
+    target = tmp_path / "RealESRGAN_x2plus.pth"
+    assert download_model(target.name, target)
+    assert target.read_bytes() == b"weights"
+    assert list(tmp_path.iterdir()) == [target]
+
+
+def test_download_model_discards_incomplete_download(tmp_path, monkeypatch):
+    monkeypatch.setattr(urllib.request, "urlopen", fake_urlopen(b"weig", 7))
+    target = tmp_path / "RealESRGAN_x2plus.pth"
+    assert not download_model(target.name, target)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_download_model_keeps_existing_weights(tmp_path, monkeypatch):
+    monkeypatch.setattr(urllib.request, "urlopen", fake_urlopen(b"weights", 7))
+    target = tmp_path / "RealESRGAN_x2plus.pth"
+    target.write_bytes(b"user weights")
+    assert download_model(target.name, target)
+    assert target.read_bytes() == b"user weights"
+
+
+def test_calibration_tiles_include_grayscale_pages(tmp_path):
+    cv2.imwrite(str(tmp_path / "a_gray.png"), random_image((40, 50)))
+    cv2.imwrite(str(tmp_path / "b_bgr.png"), random_image((40, 50, 3)))
+    cv2.imwrite(str(tmp_path / "c_bgra.png"), random_image((40, 50, 4)))
+
+    # Alpha pages are skipped; smaller pages are edge-padded to the window
+    tiles = list(_calibration_tiles(tmp_path, 48))
+    assert len(tiles) == 2
+    for tile in tiles:
+        assert tile.shape == (3, 48, 48)
+        assert tile.dtype == torch.float32
+    gray = tiles[0]
+    assert torch.equal(gray[0], gray[1]) and torch.equal(gray[1], gray[2])
+
+
+def test_enhance_fallback_keeps_stdout_clean(tmp_path, capsys):
+    # Alpha images go through RealESRGANer.enhance, which prints tile progress
+    upsampler = make_upsampler(tmp_path, 2, tile=32)
+    img = random_image((70, 50, 4))
+
+    output = batch_upscale(upsampler, [img], batch_size=4, outscale=2)[0]
+
+    assert output.shape == (140, 100, 4)
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert "Tile" in captured.err